@@ -9,7 +9,7 @@ import sys
 import warnings
 import configparser
 import getpass
-from functools import partial
+from functools import partial, lru_cache
 
 from pymysql.charset import charset_by_name, charset_by_id
 from pymysql.constants import SERVER_STATUS
@@ -33,10 +33,22 @@ from pymysql.connections import FieldDescriptorPacket
 from pymysql.connections import EOFPacketWrapper
 from pymysql.connections import OKPacketWrapper
 from pymysql.connections import LoadLocalPacketWrapper
+from pymysql.protocol import (NULL_COLUMN, UNSIGNED_SHORT_COLUMN,
+                              UNSIGNED_INT24_COLUMN, UNSIGNED_INT64_COLUMN)
+
+try:
+    from cryptography.hazmat.backends import default_backend
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import padding
+
+    _have_cryptography = True
+except ImportError:
+    _have_cryptography = False
 
 # from aiomysql.utils import _convert_to_str
 from .cursors import Cursor
-from .utils import _pack_int24, _lenenc_int, _ConnectionContextManager, _ContextManager
+from .utils import (_lenenc_int, _ConnectionContextManager,
+                    _ReadyContextManager)
 from .log import logger
 
 try:
@@ -44,6 +56,66 @@ try:
 except KeyError:
     DEFAULT_USER = "unknown"
 
+# How much to ask the StreamReader for at once when the read buffer runs
+# dry. Result sets usually carry many small row packets, reading them in
+# bulk lets _read_packet() slice most packets out of memory.
+_READ_CHUNK_SIZE = 64 * 1024
+
+# asyncio's defaults (64KiB reader limit, 64KiB write high-water mark)
+# pause the transport many times per MB on bulk transfers. Row data and
+# LOAD DATA LOCAL chunks are consumed in larger units, so allow more to
+# be buffered before applying backpressure.
+_STREAM_LIMIT = 1024 * 1024
+_WRITE_BUFFER_HIGH = 1024 * 1024
+_WRITE_BUFFER_LOW = 256 * 1024
+
+# COM_QUIT never changes: 1 byte payload, sequence id 0
+_COM_QUIT_PACKET = struct.pack('<i', 1) + bytes([COMMAND.COM_QUIT])
+
+# packet header: payload length in the low 3 bytes, sequence id in the top
+_HEADER_STRUCT = struct.Struct('<I')
+# first packet of a command: header (sequence id 0) and command byte
+_PRELUDE_STRUCT = struct.Struct('<iB')
+_THREAD_ID_STRUCT = struct.Struct('<I')
+# handshake response: client flags, max packet size, charset, filler
+_AUTH_PRELUDE_STRUCT = struct.Struct('<iIB23s')
+# initial handshake: thread id, auth-plugin-data-part-1, filler, lower
+# capability flags; then charset, status, upper capability flags, salt length
+_HANDSHAKE_STRUCT = struct.Struct('<I9xH')
+_HANDSHAKE_EXT_STRUCT = struct.Struct('<BHHB')
+# length coded integer prefixes in row data
+_UINT16_STRUCT = struct.Struct('<H')
+_UINT24_STRUCT = struct.Struct('<HB')
+_UINT64_STRUCT = struct.Struct('<Q')
+
+
+@lru_cache(maxsize=16)
+def _load_server_public_key(public_key):
+    return serialization.load_pem_public_key(public_key, default_backend())
+
+
+def _sha2_rsa_encrypt(password, salt, public_key):
+    """Encrypt password with salt and public_key.
+
+    Same as PyMySQL's ``_auth.sha2_rsa_encrypt``, except that the parsed
+    public key is cached, so connections to the same server (e.g. from a
+    pool) only parse the PEM once.
+    """
+    if not _have_cryptography:
+        raise RuntimeError(
+            "'cryptography' package is required for sha256_password or"
+            " caching_sha2_password auth methods")
+    message = _auth._xor_password(password + b'\0', salt)
+    rsa_key = _load_server_public_key(public_key)
+    return rsa_key.encrypt(
+        message,
+        padding.OAEP(
+            mgf=padding.MGF1(algorithm=hashes.SHA1()),
+            algorithm=hashes.SHA1(),
+            label=None,
+        ),
+    )
+
 
 def connect(host="localhost", user=None, password="",
             db=None, port=3306, unix_socket=None,
@@ -53,7 +125,8 @@ def connect(host="localhost", user=None, password="",
             connect_timeout=None, read_default_group=None,
             autocommit=False, echo=False,
             local_infile=False, loop=None, ssl=None, auth_plugin='',
-            program_name='', server_public_key=None):
+            program_name='', server_public_key=None, ignore_warnings=False,
+            recv_buffer_size=None, send_buffer_size=None):
     """See connections.Connection.__init__() for information about
     defaults."""
     coro = _connect(host=host, user=user, password=password, db=db,
@@ -66,7 +139,11 @@ def connect(host="localhost", user=None, password="",
                     read_default_group=read_default_group,
                     autocommit=autocommit, echo=echo,
                     local_infile=local_infile, loop=loop, ssl=ssl,
-                    auth_plugin=auth_plugin, program_name=program_name)
+                    auth_plugin=auth_plugin, program_name=program_name,
+                    server_public_key=server_public_key,
+                    ignore_warnings=ignore_warnings,
+                    recv_buffer_size=recv_buffer_size,
+                    send_buffer_size=send_buffer_size)
     return _ConnectionContextManager(coro)
 
 
@@ -80,13 +157,16 @@ async def _open_connection(host=None, port=None, **kwds):
     """This is based on asyncio.open_connection, allowing us to use a custom
     StreamReader.
 
-    `limit` arg has been removed as we don't currently use it.
+    The reader limit and write buffer limits are fixed to _STREAM_LIMIT and
+    _WRITE_BUFFER_HIGH/_WRITE_BUFFER_LOW.
     """
     loop = asyncio.events.get_running_loop()
-    reader = _StreamReader(loop=loop)
+    reader = _StreamReader(limit=_STREAM_LIMIT, loop=loop)
     protocol = asyncio.StreamReaderProtocol(reader, loop=loop)
     transport, _ = await loop.create_connection(
         lambda: protocol, host, port, **kwds)
+    transport.set_write_buffer_limits(high=_WRITE_BUFFER_HIGH,
+                                      low=_WRITE_BUFFER_LOW)
     writer = asyncio.StreamWriter(transport, protocol, reader, loop)
     return reader, writer
 
@@ -95,14 +175,17 @@ async def _open_unix_connection(path=None, **kwds):
     """This is based on asyncio.open_unix_connection, allowing us to use a custom
     StreamReader.
 
-    `limit` arg has been removed as we don't currently use it.
+    The reader limit and write buffer limits are fixed to _STREAM_LIMIT and
+    _WRITE_BUFFER_HIGH/_WRITE_BUFFER_LOW.
     """
     loop = asyncio.events.get_running_loop()
 
-    reader = _StreamReader(loop=loop)
+    reader = _StreamReader(limit=_STREAM_LIMIT, loop=loop)
     protocol = asyncio.StreamReaderProtocol(reader, loop=loop)
     transport, _ = await loop.create_unix_connection(
         lambda: protocol, path, **kwds)
+    transport.set_write_buffer_limits(high=_WRITE_BUFFER_HIGH,
+                                      low=_WRITE_BUFFER_LOW)
     writer = asyncio.StreamWriter(transport, protocol, reader, loop)
     return reader, writer
 
@@ -111,12 +194,10 @@ class _StreamReader(asyncio.StreamReader):
     """This StreamReader exposes whether EOF was received, allowing us to
     discard the associated connection instead of returning it from the pool
     when checking free connections in Pool._fill_free_pool().
-
-    `limit` arg has been removed as we don't currently use it.
     """
-    def __init__(self, loop=None):
+    def __init__(self, limit=_STREAM_LIMIT, loop=None):
         self._eof_received = False
-        super().__init__(loop=loop)
+        super().__init__(limit=limit, loop=loop)
 
     def feed_eof(self) -> None:
         self._eof_received = True
@@ -142,7 +223,9 @@ class Connection:
                  connect_timeout=None, read_default_group=None,
                  autocommit=False, echo=False,
                  local_infile=False, loop=None, ssl=None, auth_plugin='',
-                 program_name='', server_public_key=None):
+                 program_name='', server_public_key=None,
+                 ignore_warnings=False, recv_buffer_size=None,
+                 send_buffer_size=None):
         """
         Establish a connection to the MySQL database. Accepts several
         arguments:
@@ -163,7 +246,8 @@ class Connection:
             See converters.
         :param use_unicode: Whether or not to default to unicode strings.
         :param  client_flag: Custom flags to send to MySQL. Find
-            potential values in constants.CLIENT.
+            potential values in constants.CLIENT. CLIENT.COMPRESS is not
+            supported and is dropped with a warning.
         :param cursorclass: Custom cursor class to use.
         :param init_command: Initial SQL statement to run when connection is
             established.
@@ -184,6 +268,13 @@ class Connection:
             handshaking with MySQL. (omitted by default)
         :param server_public_key: SHA256 authentication plugin public
             key value.
+        :param ignore_warnings: Don't issue SHOW WARNINGS after queries
+            that produced warnings, so they are not reported as Python
+            warnings. Saves a round-trip per such query. (default: False)
+        :param recv_buffer_size: SO_RCVBUF size in bytes for TCP
+            connections. None keeps the OS default. (default: None)
+        :param send_buffer_size: SO_SNDBUF size in bytes for TCP
+            connections. None keeps the OS default. (default: None)
         :param loop: asyncio loop
         """
         self._loop = loop or asyncio.get_event_loop()
@@ -210,8 +301,12 @@ class Connection:
         self._port = port
         self._user = user or DEFAULT_USER
         self._password = password or ""
+        self._password_bytes = self._password.encode('latin1')
         self._db = db
         self._echo = echo
+        self._ignore_warnings = ignore_warnings
+        self._recv_buffer_size = recv_buffer_size
+        self._send_buffer_size = send_buffer_size
         self._last_usage = self._loop.time()
         self._client_auth_plugin = auth_plugin
         self._server_auth_plugin = ""
@@ -244,11 +339,20 @@ class Connection:
         if ssl:
             client_flag |= CLIENT.SSL
 
-        self._encoding = charset_by_name(self._charset).encoding
+        charset_info = charset_by_name(self._charset)
+        self._encoding = charset_info.encoding
+        self._charset_id = charset_info.id
 
         if local_infile:
             client_flag |= CLIENT.LOCAL_FILES
 
+        if client_flag & CLIENT.COMPRESS:
+            # the server would start sending compressed packets which we
+            # can't read, and compression costs far more CPU than it saves
+            warnings.warn("aiomysql does not support the compressed "
+                          "protocol, ignoring CLIENT.COMPRESS")
+            client_flag &= ~CLIENT.COMPRESS
+
         client_flag |= CLIENT.CAPABILITIES
         client_flag |= CLIENT.MULTI_STATEMENTS
         if self._db:
@@ -273,6 +377,9 @@ class Connection:
         # asyncio StreamReader, StreamWriter
         self._reader = None
         self._writer = None
+        # data received from self._reader, not yet consumed by _read_bytes()
+        self._read_buf = b''
+        self._read_pos = 0
         # If connection was closed for specific reason, we should show that to
         # user
         self._close_reason = None
@@ -345,8 +452,7 @@ class Connection:
         if self._writer is None:
             # connection has been closed
             return
-        send_data = struct.pack('<i', 1) + bytes([COMMAND.COM_QUIT])
-        self._writer.write(send_data)
+        self._writer.write(_COM_QUIT_PACKET)
         await self._writer.drain()
         self.close()
 
@@ -378,24 +484,26 @@ class Connection:
 
     async def _send_autocommit_mode(self):
         """Set whether or not to commit after every execute() """
-        await self._execute_command(
-            COMMAND.COM_QUERY,
-            "SET AUTOCOMMIT = %s" % self.escape(self.autocommit_mode))
+        if self.autocommit_mode:
+            sql = b"SET AUTOCOMMIT = 1"
+        else:
+            sql = b"SET AUTOCOMMIT = 0"
+        await self._execute_command(COMMAND.COM_QUERY, sql)
         await self._read_ok_packet()
 
     async def begin(self):
         """Begin transaction."""
-        await self._execute_command(COMMAND.COM_QUERY, "BEGIN")
+        await self._execute_command(COMMAND.COM_QUERY, b"BEGIN")
         await self._read_ok_packet()
 
     async def commit(self):
         """Commit changes to stable storage."""
-        await self._execute_command(COMMAND.COM_QUERY, "COMMIT")
+        await self._execute_command(COMMAND.COM_QUERY, b"COMMIT")
         await self._read_ok_packet()
 
     async def rollback(self):
         """Roll back the current transaction."""
-        await self._execute_command(COMMAND.COM_QUERY, "ROLLBACK")
+        await self._execute_command(COMMAND.COM_QUERY, b"ROLLBACK")
         await self._read_ok_packet()
 
     async def select_db(self, db):
@@ -405,7 +513,7 @@ class Connection:
 
     async def show_warnings(self):
         """SHOW WARNINGS"""
-        await self._execute_command(COMMAND.COM_QUERY, "SHOW WARNINGS")
+        await self._execute_command(COMMAND.COM_QUERY, b"SHOW WARNINGS")
         result = MySQLResult(self)
         await result.read()
         return result.rows
@@ -456,15 +564,13 @@ class Connection:
             cur = cursor_class(self, self._echo)
         else:
             cur = self.cursorclass(self, self._echo)
-        fut = self._loop.create_future()
-        fut.set_result(cur)
-        return _ContextManager(fut)
+        return _ReadyContextManager(cur)
 
     # The following methods are INTERNAL USE ONLY (called from Cursor)
     async def query(self, sql, unbuffered=False):
         # logger.debug("DEBUG: sending query: %s", _convert_to_str(sql))
         if isinstance(sql, str):
-            sql = sql.encode(self.encoding, 'surrogateescape')
+            sql = sql.encode(self._encoding, 'surrogateescape')
         await self._execute_command(COMMAND.COM_QUERY, sql)
         await self._read_query_result(unbuffered=unbuffered)
         return self._affected_rows
@@ -477,7 +583,7 @@ class Connection:
         return self._affected_rows
 
     async def kill(self, thread_id):
-        arg = struct.pack('<I', thread_id)
+        arg = _THREAD_ID_STRUCT.pack(thread_id)
         await self._execute_command(COMMAND.COM_PROCESS_KILL, arg)
         await self._read_ok_packet()
 
@@ -490,7 +596,7 @@ class Connection:
             else:
                 raise Error("Already closed")
         try:
-            await self._execute_command(COMMAND.COM_PING, "")
+            await self._execute_command(COMMAND.COM_PING, b"")
             await self._read_ok_packet()
         except Exception:
             if reconnect:
@@ -502,12 +608,13 @@ class Connection:
     async def set_charset(self, charset):
         """Sets the character set for the current connection"""
         # Make sure charset is supported.
-        encoding = charset_by_name(charset).encoding
+        charset_info = charset_by_name(charset)
         await self._execute_command(COMMAND.COM_QUERY, "SET NAMES %s"
                                     % self.escape(charset))
         await self._read_packet()
         self._charset = charset
-        self._encoding = encoding
+        self._encoding = charset_info.encoding
+        self._charset_id = charset_info.id
 
     async def _connect(self):
         # TODO: Set close callback
@@ -530,26 +637,38 @@ class Connection:
                             self._host,
                             self._port),
                         timeout=self.connect_timeout)
-                self._set_keep_alive()
-                self._set_nodelay(True)
+                self._configure_socket()
                 self.host_info = "socket %s:%d" % (self._host, self._port)
 
             self._next_seq_id = 0
+            self._read_buf = b''
+            self._read_pos = 0
 
             await self._get_server_information()
             await self._request_authentication()
 
             self.connected_time = self._loop.time()
 
+            # Session setup is sent as multi-statement queries to save
+            # round trips. init_command always ends its batch, so a trailing
+            # comment or semicolon in it can't swallow our statements.
+            statements = []
             if self.sql_mode is not None:
-                await self.query(f"SET sql_mode={self.sql_mode}")
+                statements.append(f"SET sql_mode={self.sql_mode}")
 
             if self.init_command is not None:
-                await self.query(self.init_command)
-                await self.commit()
+                statements.append(self.init_command)
+                await self._query_batch(statements)
+                statements = ["COMMIT"]
 
             if self.autocommit_mode is not None:
-                await self.autocommit(self.autocommit_mode)
+                self.autocommit_mode = bool(self.autocommit_mode)
+                if self.autocommit_mode != self.get_autocommit():
+                    if self.autocommit_mode:
+                        statements.append("SET AUTOCOMMIT = 1")
+                    else:
+                        statements.append("SET AUTOCOMMIT = 0")
+            await self._query_batch(statements)
         except Exception as e:
             if self._writer:
                 self._writer.transport.close()
@@ -570,24 +689,35 @@ class Connection:
             # reraise it.
             raise
 
-    def _set_keep_alive(self):
-        transport = self._writer.transport
-        transport.pause_reading()
-        raw_sock = transport.get_extra_info('socket', default=None)
-        if raw_sock is None:
-            raise RuntimeError("Transport does not expose socket instance")
-        raw_sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
-        transport.resume_reading()
+    async def _query_batch(self, statements):
+        """Run statements in a single round trip if the server allows it,
+        discarding their results."""
+        if not statements:
+            return
+        if self.server_capabilities & CLIENT.MULTI_STATEMENTS:
+            statements = [";".join(statements)]
+        for sql in statements:
+            await self.query(sql)
+            while self._result.has_next:
+                await self.next_result()
 
-    def _set_nodelay(self, value):
-        flag = int(bool(value))
+    def _configure_socket(self):
+        """Enable keep-alive and disable Nagle on a TCP connection, and
+        apply the requested socket buffer sizes."""
         transport = self._writer.transport
-        transport.pause_reading()
         raw_sock = transport.get_extra_info('socket', default=None)
         if raw_sock is None:
             raise RuntimeError("Transport does not expose socket instance")
-        raw_sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, flag)
-        transport.resume_reading()
+        raw_sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        raw_sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        # setting these turns off the kernel's buffer autotuning, so
+        # they are only touched when asked for
+        if self._recv_buffer_size is not None:
+            raw_sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF,
+                                self._recv_buffer_size)
+        if self._send_buffer_size is not None:
+            raw_sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF,
+                                self._send_buffer_size)
 
     def write_packet(self, payload):
         """Writes an entire "mysql packet" in its entirety to the network
@@ -595,25 +725,29 @@ class Connection:
         """
         # Internal note: when you build packet manually and calls
         # _write_bytes() directly, you should set self._next_seq_id properly.
-        data = _pack_int24(len(payload)) + bytes([self._next_seq_id]) + payload
+        data = _HEADER_STRUCT.pack(len(payload) | self._next_seq_id << 24) + payload
         self._write_bytes(data)
-        self._next_seq_id = (self._next_seq_id + 1) % 256
+        self._next_seq_id = (self._next_seq_id + 1) & 0xff
 
     async def _read_packet(self, packet_type=MysqlPacket):
         """Read an entire "mysql packet" in its entirety from the network
         and return a MysqlPacket type that represents the results.
         """
-        buff = b''
+        buff = []
         while True:
-            try:
-                packet_header = await self._read_bytes(4)
-            except asyncio.CancelledError:
-                self._close_on_cancel()
-                raise
-
-            btrl, btrh, packet_number = struct.unpack(
-                '<HBB', packet_header)
-            bytes_to_read = btrl + (btrh << 16)
+            # decode the header straight from the receive buffer
+            pos = self._read_pos
+            if pos + 4 > len(self._read_buf):
+                try:
+                    await self._fill_read_buf(4)
+                except asyncio.CancelledError:
+                    self._close_on_cancel()
+                    raise
+                pos = 0
+            header = _HEADER_STRUCT.unpack_from(self._read_buf, pos)[0]
+            bytes_to_read = header & 0xffffff
+            packet_number = header >> 24
+            self._read_pos = pos + 4
 
             # Outbound and inbound packets are numbered sequentialy, so
             # we increment in both write_packet and read_packet. The count
@@ -629,7 +763,7 @@ class Connection:
                 raise InternalError(
                     "Packet sequence number wrong - got %d expected %d" %
                     (packet_number, self._next_seq_id))
-            self._next_seq_id = (self._next_seq_id + 1) % 256
+            self._next_seq_id = (self._next_seq_id + 1) & 0xff
 
             try:
                 recv_data = await self._read_bytes(bytes_to_read)
@@ -637,14 +771,16 @@ class Connection:
                 self._close_on_cancel()
                 raise
 
-            buff += recv_data
             # https://dev.mysql.com/doc/internals/en/sending-more-than-16mbyte.html
-            if bytes_to_read == 0xffffff:
-                continue
             if bytes_to_read < MAX_PACKET_LEN:
+                # almost every packet fits in one fragment
+                if buff:
+                    buff.append(recv_data)
+                    recv_data = b''.join(buff)
                 break
+            buff.append(recv_data)
 
-        packet = packet_type(buff, self._encoding)
+        packet = packet_type(recv_data, self._encoding)
         if packet.is_error_packet():
             if self._result is not None and \
                self._result.unbuffered_active is True:
@@ -653,18 +789,40 @@ class Connection:
         return packet
 
     async def _read_bytes(self, num_bytes):
-        try:
-            data = await self._reader.readexactly(num_bytes)
-        except asyncio.IncompleteReadError as e:
-            msg = "Lost connection to MySQL server during query"
-            self.close()
-            raise OperationalError(CR.CR_SERVER_LOST, msg) from e
-        except OSError as e:
-            msg = f"Lost connection to MySQL server during query ({e})"
-            self.close()
-            raise OperationalError(CR.CR_SERVER_LOST, msg) from e
+        pos = self._read_pos
+        end = pos + num_bytes
+        if end > len(self._read_buf):
+            await self._fill_read_buf(num_bytes)
+            pos, end = 0, num_bytes
+        data = self._read_buf[pos:end]
+        if end == len(self._read_buf):
+            # don't hold on to large payloads after they're consumed
+            self._read_buf = b''
+            end = 0
+        self._read_pos = end
         return data
 
+    async def _fill_read_buf(self, num_bytes):
+        """Read from the socket until at least num_bytes are buffered."""
+        chunks = [self._read_buf[self._read_pos:]]
+        missing = num_bytes - len(chunks[0])
+        while missing > 0:
+            try:
+                data = await self._reader.read(
+                    max(missing, _READ_CHUNK_SIZE))
+            except OSError as e:
+                msg = f"Lost connection to MySQL server during query ({e})"
+                self.close()
+                raise OperationalError(CR.CR_SERVER_LOST, msg) from e
+            if not data:
+                msg = "Lost connection to MySQL server during query"
+                self.close()
+                raise OperationalError(CR.CR_SERVER_LOST, msg)
+            chunks.append(data)
+            missing -= len(data)
+        self._read_buf = b''.join(chunks)
+        self._read_pos = 0
+
     def _write_bytes(self, data):
         return self._writer.write(data)
 
@@ -718,35 +876,44 @@ class Connection:
         if isinstance(sql, str):
             sql = sql.encode(self._encoding)
 
-        chunk_size = min(MAX_PACKET_LEN, len(sql) + 1)  # +1 is for command
-
-        prelude = struct.pack('<iB', chunk_size, command)
-        self._write_bytes(prelude + sql[:chunk_size - 1])
-        # logger.debug(dump_packet(prelude + sql))
-        self._next_seq_id = 1
+        sql_len = len(sql)
+        chunk_size = min(MAX_PACKET_LEN, sql_len + 1)  # +1 is for command
 
+        prelude = _PRELUDE_STRUCT.pack(chunk_size, command)
         if chunk_size < MAX_PACKET_LEN:
+            self._write_bytes(prelude + sql)
+            # logger.debug(dump_packet(prelude + sql))
+            self._next_seq_id = 1
             return
 
-        sql = sql[chunk_size - 1:]
+        # Send the packets as views into sql, slicing a copy of the
+        # remaining data for every packet would make huge commands
+        # quadratic. All of them go to the transport in one call.
+        sql = memoryview(sql)
+        offset = chunk_size - 1
+        parts = [prelude, sql[:offset]]
+        seq_id = 1
         while True:
-            chunk_size = min(MAX_PACKET_LEN, len(sql))
-            self.write_packet(sql[:chunk_size])
-            sql = sql[chunk_size:]
-            if not sql and chunk_size < MAX_PACKET_LEN:
+            chunk_size = min(MAX_PACKET_LEN, sql_len - offset)
+            parts.append(_HEADER_STRUCT.pack(chunk_size | seq_id << 24))
+            parts.append(sql[offset:offset + chunk_size])
+            seq_id = (seq_id + 1) & 0xff
+            offset += chunk_size
+            if offset == sql_len and chunk_size < MAX_PACKET_LEN:
                 break
+        self._writer.writelines(parts)
+        self._next_seq_id = seq_id
 
     async def _request_authentication(self):
         # https://dev.mysql.com/doc/internals/en/connection-phase-packets.html#packet-Protocol::HandshakeResponse
-        if int(self.server_version.split('.', 1)[0]) >= 5:
+        if self._server_major >= 5:
             self.client_flag |= CLIENT.MULTI_RESULTS
 
         if self.user is None:
             raise ValueError("Did not specify a username")
 
-        charset_id = charset_by_name(self.charset).id
-        data_init = struct.pack('<iIB23s', self.client_flag, MAX_PACKET_LEN,
-                                charset_id, b'')
+        data_init = _AUTH_PRELUDE_STRUCT.pack(
+            self.client_flag, MAX_PACKET_LEN, self._charset_id, b'')
 
         if self._ssl_context and self.server_capabilities & CLIENT.SSL:
             self.write_packet(data_init)
@@ -778,7 +945,10 @@ class Connection:
         else:
             _user = self.user
 
-        data = data_init + _user + b'\0'
+        # the response is built in place, each field is appended once
+        data = bytearray(data_init)
+        data += _user
+        data.append(0)
 
         authresp = b''
 
@@ -789,31 +959,43 @@ class Connection:
 
         if auth_plugin in ('', 'mysql_native_password'):
             authresp = _auth.scramble_native_password(
-                self._password.encode('latin1'), self.salt)
+                self._password_bytes, self.salt)
         elif auth_plugin == 'caching_sha2_password':
-            if self._password:
+            if self._password_bytes:
                 authresp = _auth.scramble_caching_sha2(
-                    self._password.encode('latin1'), self.salt
+                    self._password_bytes, self.salt
                 )
             # Else: empty password
         elif auth_plugin == 'sha256_password':
             if self._ssl_context and self.server_capabilities & CLIENT.SSL:
-                authresp = self._password.encode('latin1') + b'\0'
-            elif self._password:
+                authresp = self._password_bytes + b'\0'
+            elif self._password_bytes and self.server_public_key and \
+                    self.server_capabilities & \
+                    CLIENT.PLUGIN_AUTH_LENENC_CLIENT_DATA:
+                # public key is already known (given by the user or kept
+                # from a previous handshake), skip requesting it again
+                authresp = _sha2_rsa_encrypt(
+                    self._password_bytes, self.salt,
+                    self.server_public_key
+                )
+            elif self._password_bytes:
                 authresp = b'\1'  # request public key
             else:
                 authresp = b'\0'  # empty password
 
         elif auth_plugin in ('', 'mysql_clear_password'):
-            authresp = self._password.encode('latin1') + b'\0'
+            authresp = self._password_bytes + b'\0'
 
         if self.server_capabilities & CLIENT.PLUGIN_AUTH_LENENC_CLIENT_DATA:
-            data += _lenenc_int(len(authresp)) + authresp
+            data += _lenenc_int(len(authresp))
+            data += authresp
         elif self.server_capabilities & CLIENT.SECURE_CONNECTION:
-            data += struct.pack('B', len(authresp)) + authresp
+            data.append(len(authresp))
+            data += authresp
         else:  # pragma: no cover
             # not testing against servers without secure auth (>=5.0)
-            data += authresp + b'\0'
+            data += authresp
+            data.append(0)
 
         if self._db and self.server_capabilities & CLIENT.CONNECT_WITH_DB:
 
@@ -821,24 +1003,29 @@ class Connection:
                 db = self._db.encode(self.encoding)
             else:
                 db = self._db
-            data += db + b'\0'
+            data += db
+            data.append(0)
 
         if self.server_capabilities & CLIENT.PLUGIN_AUTH:
             name = auth_plugin
             if isinstance(name, str):
                 name = name.encode('ascii')
-            data += name + b'\0'
+            data += name
+            data.append(0)
 
         self._auth_plugin_used = auth_plugin
 
         # Sends the server a few pieces of client info
         if self.server_capabilities & CLIENT.CONNECT_ATTRS:
-            connect_attrs = b''
+            connect_attrs = bytearray()
             for k, v in self._connect_attrs.items():
                 k, v = k.encode('utf8'), v.encode('utf8')
-                connect_attrs += struct.pack('B', len(k)) + k
-                connect_attrs += struct.pack('B', len(v)) + v
-            data += struct.pack('B', len(connect_attrs)) + connect_attrs
+                connect_attrs.append(len(k))
+                connect_attrs += k
+                connect_attrs.append(len(v))
+                connect_attrs += v
+            data.append(len(connect_attrs))
+            data += connect_attrs
 
         self.write_packet(data)
         auth_packet = await self._read_packet()
@@ -856,7 +1043,7 @@ class Connection:
             else:
                 # send legacy handshake
                 data = _auth.scramble_old_password(
-                    self._password.encode('latin1'),
+                    self._password_bytes,
                     auth_packet.read_all()) + b'\0'
                 self.write_packet(data)
                 await self._read_packet()
@@ -884,19 +1071,19 @@ class Connection:
                 # secure-password-authentication.html#packet-Authentication::
                 # Native41
                 data = _auth.scramble_native_password(
-                    self._password.encode('latin1'),
+                    self._password_bytes,
                     auth_packet.read_all())
             elif plugin_name == b"mysql_old_password":
                 # https://dev.mysql.com/doc/internals/en/
                 # old-password-authentication.html
                 data = _auth.scramble_old_password(
-                    self._password.encode('latin1'),
+                    self._password_bytes,
                     auth_packet.read_all()
                 ) + b'\0'
             elif plugin_name == b"mysql_clear_password":
                 # https://dev.mysql.com/doc/internals/en/
                 # clear-text-authentication.html
-                data = self._password.encode('latin1') + b'\0'
+                data = self._password_bytes + b'\0'
             else:
                 raise OperationalError(
                     2059, "Authentication plugin '{}'"
@@ -913,7 +1100,7 @@ class Connection:
 
     async def caching_sha2_password_auth(self, pkt):
         # No password fast path
-        if not self._password:
+        if not self._password_bytes:
             self.write_packet(b'')
             pkt = await self._read_packet()
             pkt.check_error()
@@ -924,7 +1111,7 @@ class Connection:
             logger.debug("caching sha2: Trying fast path")
             self.salt = pkt.read_all()
             scrambled = _auth.scramble_caching_sha2(
-                self._password.encode('latin1'), self.salt
+                self._password_bytes, self.salt
             )
 
             self.write_packet(scrambled)
@@ -962,7 +1149,7 @@ class Connection:
         if self._secure:
             logger.debug("caching sha2: Sending plain "
                          "password via secure connection")
-            self.write_packet(self._password.encode('latin1') + b'\0')
+            self.write_packet(self._password_bytes + b'\0')
             pkt = await self._read_packet()
             pkt.check_error()
             return pkt
@@ -981,8 +1168,8 @@ class Connection:
             self.server_public_key = pkt._data[1:]
             logger.debug(self.server_public_key.decode('ascii'))
 
-        data = _auth.sha2_rsa_encrypt(
-            self._password.encode('latin1'), self.salt,
+        data = _sha2_rsa_encrypt(
+            self._password_bytes, self.salt,
             self.server_public_key
         )
         self.write_packet(data)
@@ -992,7 +1179,7 @@ class Connection:
     async def sha256_password_auth(self, pkt):
         if self._secure:
             logger.debug("sha256: Sending plain password")
-            data = self._password.encode('latin1') + b'\0'
+            data = self._password_bytes + b'\0'
             self.write_packet(data)
             pkt = await self._read_packet()
             pkt.check_error()
@@ -1000,7 +1187,7 @@ class Connection:
 
         if pkt.is_auth_switch_request():
             self.salt = pkt.read_all()
-            if not self.server_public_key and self._password:
+            if not self.server_public_key and self._password_bytes:
                 # Request server public key
                 logger.debug("sha256: Requesting server public key")
                 self.write_packet(b'\1')
@@ -1014,12 +1201,12 @@ class Connection:
                 self.server_public_key.decode('ascii')
             )
 
-        if self._password:
+        if self._password_bytes:
             if not self.server_public_key:
                 raise OperationalError("Couldn't receive server's public key")
 
-            data = _auth.sha2_rsa_encrypt(
-                self._password.encode('latin1'), self.salt,
+            data = _sha2_rsa_encrypt(
+                self._password_bytes, self.salt,
                 self.server_public_key
             )
         else:
@@ -1051,22 +1238,23 @@ class Connection:
         self.protocol_version = data[i]
         i += 1
 
-        server_end = data.find(b'\0', i)
+        server_end = data.find(0, i)
         self.server_version = data[i:server_end].decode('latin1')
+        self._server_major = int(self.server_version.split('.', 1)[0])
         i = server_end + 1
 
-        self.server_thread_id = struct.unpack('<I', data[i:i + 4])
-        i += 4
-
-        self.salt = data[i:i + 8]
-        i += 9  # 8 + 1(filler)
-
-        self.server_capabilities = struct.unpack('<H', data[i:i + 2])[0]
-        i += 2
+        # thread id, auth-plugin-data-part-1 (the first 8 bytes of the salt,
+        # picked up below), filler, capability flags (lower 2 bytes)
+        thread_id, self.server_capabilities = _HANDSHAKE_STRUCT.unpack_from(
+            data, i)
+        self.server_thread_id = (thread_id,)
+        salt_start = i + 4
+        i += _HANDSHAKE_STRUCT.size
 
         if len(data) >= i + 6:
-            lang, stat, cap_h, salt_len = struct.unpack('<BHHB', data[i:i + 6])
-            i += 6
+            lang, stat, cap_h, salt_len = _HANDSHAKE_EXT_STRUCT.unpack_from(
+                data, i)
+            i += _HANDSHAKE_EXT_STRUCT.size
             self.server_language = lang
             try:
                 self.server_charset = charset_by_id(lang).name
@@ -1085,8 +1273,11 @@ class Connection:
 
         if len(data) >= i + salt_len:
             # salt_len includes auth_plugin_data_part_1 and filler
-            self.salt += data[i:i + salt_len]
+            self.salt = (data[salt_start:salt_start + 8] +
+                         data[i:i + salt_len])
             i += salt_len
+        else:
+            self.salt = data[salt_start:salt_start + 8]
 
         i += 1
 
@@ -1278,31 +1469,65 @@ class MySQLResult:
     async def _read_rowdata_packet(self):
         """Read a rowdata packet for each data row in the result set."""
         rows = []
+        # runs once per row, keep the lookups out of the loop
+        append = rows.append
+        read_packet = self.connection._read_packet
+        check_eof = self._check_packet_is_eof
+        read_row = self._read_row_from_packet
         while True:
-            packet = await self.connection._read_packet()
-            if self._check_packet_is_eof(packet):
+            packet = await read_packet()
+            if check_eof(packet):
                 # release reference to kill cyclic reference.
                 self.connection = None
                 break
-            rows.append(self._read_row_from_packet(packet))
+            append(read_row(packet))
 
         self.affected_rows = len(rows)
         self.rows = tuple(rows)
 
     def _read_row_from_packet(self, packet):
+        # This runs for every cell, so the length coded strings are
+        # decoded inline instead of through packet.read_length_coded_string()
+        buf = packet.get_all_data()
+        buf_len = len(buf)
+        pos = 0
         row = []
         for encoding, converter in self.converters:
             try:
-                data = packet.read_length_coded_string()
+                length = buf[pos]
             except IndexError:
                 # No more columns in this row
                 # See https://github.com/PyMySQL/PyMySQL/pull/434
                 break
-            if data is not None:
-                if encoding is not None:
-                    data = data.decode(encoding)
-                if converter is not None:
-                    data = converter(data)
+            pos += 1
+            if length >= NULL_COLUMN:
+                # a short prefix raises struct.error like MysqlPacket does
+                if length == UNSIGNED_SHORT_COLUMN:
+                    length = _UINT16_STRUCT.unpack_from(buf, pos)[0]
+                    pos += 2
+                elif length == UNSIGNED_INT24_COLUMN:
+                    low, high = _UINT24_STRUCT.unpack_from(buf, pos)
+                    length = low + (high << 16)
+                    pos += 3
+                elif length == UNSIGNED_INT64_COLUMN:
+                    length = _UINT64_STRUCT.unpack_from(buf, pos)[0]
+                    pos += 8
+                else:
+                    # NULL_COLUMN, MysqlPacket also reads 0xff as NULL
+                    row.append(None)
+                    continue
+            end = pos + length
+            if end > buf_len:
+                raise AssertionError(
+                    "Result length not requested length:\n"
+                    f"Expected={length}.  Actual={buf_len - pos}.  "
+                    f"Position: {pos}.  Data Length: {buf_len}")
+            data = buf[pos:end]
+            pos = end
+            if encoding is not None:
+                data = data.decode(encoding)
+            if converter is not None:
+                data = converter(data)
             row.append(data)
         return tuple(row)
 
@@ -1312,10 +1537,11 @@ class MySQLResult:
         self.converters = []
         use_unicode = self.connection.use_unicode
         conn_encoding = self.connection.encoding
+        decoders = self.connection.decoders
+        read_packet = self.connection._read_packet
         description = []
         for i in range(self.field_count):
-            field = await self.connection._read_packet(
-                FieldDescriptorPacket)
+            field = await read_packet(FieldDescriptorPacket)
             self.fields.append(field)
             description.append(field.description())
             field_type = field.type_code
@@ -1341,12 +1567,16 @@ class MySQLResult:
                     encoding = 'ascii'
             else:
                 encoding = None
-            converter = self.connection.decoders.get(field_type)
+            converter = decoders.get(field_type)
             if converter is through:
                 converter = None
+            elif converter is int or converter is float:
+                # int() and float() parse ascii bytes directly,
+                # no need to decode every numeric cell first
+                encoding = None
             self.converters.append((encoding, converter))
 
-        eof_packet = await self.connection._read_packet()
+        eof_packet = await read_packet()
         assert eof_packet.is_eof_packet(), 'Protocol error, expecting EOF'
         self.description = tuple(description)
 
@@ -1404,8 +1634,11 @@ class LoadLocalFile:
                     chunk = await self._file_read(chunk_size)
                     if not chunk:
                         break
-                    # TODO: consider drain data
                     conn.write_packet(chunk)
+                    # don't read the next chunk before the transport
+                    # buffer has room, or the whole file could end up
+                    # in memory on a slow link
+                    await conn._writer.drain()
         except asyncio.CancelledError:
             self.connection._close_on_cancel()
             raise
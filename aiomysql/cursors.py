@@ -475,7 +475,7 @@ class Cursor:
         self._lastrowid = result.insert_id
         self._rows = result.rows
 
-        if result.warning_count > 0:
+        if result.warning_count > 0 and not conn._ignore_warnings:
             await self._show_warnings(conn)
 
     async def _show_warnings(self, conn):
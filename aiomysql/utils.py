@@ -2,9 +2,9 @@ from collections.abc import Coroutine
 
 import struct
 
-
-def _pack_int24(n):
-    return struct.pack("<I", n)[:3]
+_UINT16_STRUCT = struct.Struct("<H")
+_UINT32_STRUCT = struct.Struct("<I")
+_UINT64_STRUCT = struct.Struct("<Q")
 
 
 def _lenenc_int(i):
@@ -15,11 +15,11 @@ def _lenenc_int(i):
     elif i < 0xFB:
         return bytes([i])
     elif i < (1 << 16):
-        return b"\xfc" + struct.pack("<H", i)
+        return b"\xfc" + _UINT16_STRUCT.pack(i)
     elif i < (1 << 24):
-        return b"\xfd" + struct.pack("<I", i)[:3]
+        return b"\xfd" + _UINT32_STRUCT.pack(i)[:3]
     elif i < (1 << 64):
-        return b"\xfe" + struct.pack("<Q", i)
+        return b"\xfe" + _UINT64_STRUCT.pack(i)
     else:
         raise ValueError(
             "Encoding %x is larger than %x - no representation in LengthEncodedInteger"
@@ -79,6 +79,32 @@ class _ContextManager(Coroutine):
         self._obj = None
 
 
+class _ReadyContextManager:
+    """Like _ContextManager, for an object that is already available.
+
+    Awaiting it returns the object right away, without going through a
+    future or a coroutine.
+    """
+
+    __slots__ = ('_obj',)
+
+    def __init__(self, obj):
+        self._obj = obj
+
+    def __await__(self):
+        return self._obj
+        yield  # makes __await__ a generator
+
+    __iter__ = __await__
+
+    async def __aenter__(self):
+        return self._obj
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self._obj.close()
+        self._obj = None
+
+
 class _ConnectionContextManager(_ContextManager):
     async def __aexit__(self, exc_type, exc, tb):
         if exc_type is not None:
@@ -1,8 +1,11 @@
 import asyncio
 import gc
 import os
+import socket
+import warnings
 
 import pytest
+from pymysql.constants import CLIENT
 
 import aiomysql
 
@@ -126,6 +129,55 @@ async def test_init_param(connection_creator):
     assert con.escape("foo'bar") == "'foo''bar'"
 
 
+@pytest.mark.run_loop
+async def test_combined_session_setup(connection_creator):
+    # sql_mode, init_command and autocommit are sent as batched
+    # multi-statement queries on connect. The init_command turns
+    # autocommit off, so autocommit=True has to switch it back on.
+    init_command = "SET @a = 1; SET @b = 'two'; SET AUTOCOMMIT = 0"
+    con = await connection_creator(sql_mode='NO_BACKSLASH_ESCAPES',
+                                   init_command=init_command,
+                                   autocommit=True)
+    assert con.get_autocommit() is True
+    cur = await con.cursor()
+    await cur.execute("SELECT @@sql_mode, @a, @b, @@autocommit")
+    sql_mode, a, b, autocommit = await cur.fetchone()
+    assert 'NO_BACKSLASH_ESCAPES' in sql_mode
+    assert (a, b, autocommit) == (1, 'two', 1)
+    assert con.escape("foo'bar") == "'foo''bar'"
+    await cur.execute("SELECT 1")
+    assert await cur.fetchone() == (1,)
+
+
+@pytest.mark.run_loop
+async def test_ignore_warnings(connection_creator):
+    con = await connection_creator(ignore_warnings=True)
+    cur = await con.cursor()
+    with warnings.catch_warnings(record=True) as w:
+        warnings.simplefilter("always")
+        await cur.execute("SELECT CAST('1x' AS SIGNED)")
+    assert not [x for x in w if x.category is aiomysql.Warning]
+    assert await cur.fetchone() == (1,)
+    # explicitly asking still works
+    assert await con.show_warnings()
+
+
+@pytest.mark.run_loop
+async def test_socket_buffer_sizes(connection_creator):
+    con = await connection_creator(recv_buffer_size=256 * 1024,
+                                   send_buffer_size=256 * 1024)
+    sock = con._writer.transport.get_extra_info('socket')
+    if sock.family != socket.AF_UNIX:
+        # linux reports double the requested size
+        assert sock.getsockopt(socket.SOL_SOCKET,
+                               socket.SO_RCVBUF) >= 256 * 1024
+        assert sock.getsockopt(socket.SOL_SOCKET,
+                               socket.SO_SNDBUF) >= 256 * 1024
+    cur = await con.cursor()
+    await cur.execute("SELECT 1")
+    assert await cur.fetchone() == (1,)
+
+
 @pytest.mark.run_loop
 async def test_autocommit(connection_creator):
     con = await connection_creator()
@@ -224,6 +276,16 @@ async def test_connection_properties(connection_creator, mysql_params):
     conn.close()
 
 
+@pytest.mark.run_loop
+async def test_compress_flag_dropped(connection_creator):
+    with pytest.warns(UserWarning, match="compressed protocol"):
+        conn = await connection_creator(client_flag=CLIENT.COMPRESS)
+    assert not conn.client_flag & CLIENT.COMPRESS
+    cur = await conn.cursor()
+    await cur.execute("SELECT 1")
+    assert await cur.fetchone() == (1,)
+
+
 @pytest.mark.run_loop
 async def test_connection_double_ensure_closed(connection_creator):
     conn = await connection_creator()
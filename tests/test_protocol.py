@@ -0,0 +1,112 @@
+import struct
+
+import pytest
+from pymysql.connections import MysqlPacket
+from pymysql.constants import CR
+
+import aiomysql.connection
+from aiomysql.connection import Connection, MySQLResult
+
+
+def _row_result(converters):
+    result = MySQLResult.__new__(MySQLResult)
+    result.converters = converters
+    return result
+
+
+def test_read_row_from_packet():
+    result = _row_result([('utf8', None), (None, int), (None, None),
+                          (None, None), ('utf8', None)])
+    long_value = b'x' * 300
+    data = (b'\x03foo' + b'\x0242' + b'\xfb' +
+            b'\xfc' + struct.pack('<H', 300) + long_value + b'\x00')
+    row = result._read_row_from_packet(MysqlPacket(data, 'utf8'))
+    assert row == ('foo', 42, None, long_value, '')
+
+
+def test_read_row_from_packet_short_row():
+    # a row ending on a column boundary just has fewer columns
+    result = _row_result([(None, None)] * 3)
+    row = result._read_row_from_packet(MysqlPacket(b'\x01a', 'utf8'))
+    assert row == (b'a',)
+
+
+@pytest.mark.parametrize('data', [
+    b'\x05ab',
+    b'\x01a\x03b',
+    b'\xfc' + struct.pack('<H', 300) + b'x' * 10,
+])
+def test_read_row_from_packet_truncated_value(data):
+    result = _row_result([(None, None)] * 2)
+    with pytest.raises(AssertionError,
+                       match='Result length not requested length'):
+        result._read_row_from_packet(MysqlPacket(data, 'utf8'))
+
+
+@pytest.mark.parametrize('data', [b'\xfc\x01', b'\xfd\x01\x02', b'\xfe\x01'])
+def test_read_row_from_packet_truncated_length(data):
+    result = _row_result([(None, None)])
+    with pytest.raises(struct.error):
+        result._read_row_from_packet(MysqlPacket(data, 'utf8'))
+
+
+class _FakeReader:
+    """Hands out the given bytes at most read_size bytes at a time."""
+
+    def __init__(self, data, read_size):
+        self._data = data
+        self._read_size = read_size
+
+    async def read(self, n):
+        n = min(n, self._read_size)
+        data, self._data = self._data[:n], self._data[n:]
+        return data
+
+
+def _packet(seq_id, payload):
+    return struct.pack('<I', len(payload))[:3] + bytes([seq_id]) + payload
+
+
+def _fake_connection(loop, data, read_size):
+    conn = Connection(loop=loop)
+    conn._reader = _FakeReader(data, read_size)
+    conn._read_buf = b''
+    conn._read_pos = 0
+    conn._next_seq_id = 0
+    return conn
+
+
+@pytest.mark.run_loop
+@pytest.mark.parametrize('read_size', [1, 3, 7, 64, 64 * 1024])
+async def test_read_packet(loop, monkeypatch, read_size):
+    # with a max packet length of 8, a 20 byte payload is sent as 8+8+4
+    # and an 8 byte payload as 8 followed by an empty fragment
+    monkeypatch.setattr(aiomysql.connection, 'MAX_PACKET_LEN', 8)
+    large = bytes(range(1, 21))
+    exact = b'abcdefgh'
+    data = (_packet(0, large[:8]) + _packet(1, large[8:16]) +
+            _packet(2, large[16:]) +
+            _packet(3, exact) + _packet(4, b'') +
+            _packet(5, b'xyz') +
+            _packet(6, b'\x00ok'))
+    conn = _fake_connection(loop, data, read_size)
+
+    assert (await conn._read_packet()).get_all_data() == large
+    assert (await conn._read_packet()).get_all_data() == exact
+    assert (await conn._read_packet()).get_all_data() == b'xyz'
+    assert (await conn._read_packet()).get_all_data() == b'\x00ok'
+    assert conn._next_seq_id == 7
+    assert conn._read_buf[conn._read_pos:] == b''
+
+
+@pytest.mark.run_loop
+@pytest.mark.parametrize('data', [
+    _packet(0, b'abcdefghij')[:8],
+    _packet(0, b'abc')[:2],
+])
+async def test_read_packet_eof(loop, data):
+    conn = _fake_connection(loop, data, 3)
+    with pytest.raises(aiomysql.OperationalError) as exc_info:
+        await conn._read_packet()
+    assert exc_info.value.args[0] == CR.CR_SERVER_LOST
+    assert conn._reader is None
@@ -1,5 +1,6 @@
 import copy
-from aiomysql import create_pool
+from aiomysql import connect, create_pool
+from aiomysql.connection import Connection
 
 import pytest
 
@@ -68,6 +69,47 @@ async def test_sha256_pw(mysql_server, loop):
             assert conn._auth_plugin_used == 'sha256_password'
 
 
+@pytest.mark.run_loop
+async def test_sha256_pw_known_public_key(mysql_server, loop, monkeypatch):
+    ensure_mysql_version(mysql_server)
+
+    if "unix_socket" in mysql_server['conn_params']:
+        pytest.skip("sha256_password is not supported on unix sockets")
+
+    connection_data = copy.copy(mysql_server['conn_params'])
+    connection_data['user'] = 'user_sha256'
+    connection_data['password'] = 'pass_sha256'
+    # over TLS the password is sent in plain text and no key is involved
+    connection_data.pop('ssl', None)
+
+    # the first connection has to ask the server for its public key
+    async with connect(**connection_data, loop=loop) as conn:
+        assert conn._auth_plugin_used == 'sha256_password'
+        public_key = conn.server_public_key
+    assert public_key
+
+    extra_auth_calls = []
+    sha256_password_auth = Connection.sha256_password_auth
+
+    async def recording_sha256_password_auth(self, pkt):
+        extra_auth_calls.append(pkt)
+        return await sha256_password_auth(self, pkt)
+
+    monkeypatch.setattr(Connection, 'sha256_password_auth',
+                        recording_sha256_password_auth)
+
+    # with the key known, the encrypted password goes into the handshake
+    async with connect(**connection_data, loop=loop,
+                       auth_plugin='sha256_password',
+                       server_public_key=public_key) as conn:
+        assert conn._auth_plugin_used == 'sha256_password'
+        assert conn.server_public_key == public_key
+        await conn.ping()
+    # the server accepted the handshake response without another
+    # round-trip, so the public key was not requested again
+    assert extra_auth_calls == []
+
+
 @pytest.mark.run_loop
 async def test_cached_sha256_nopw(mysql_server, loop):
     ensure_mysql_version(mysql_server)